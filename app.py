@@ -1,8 +1,10 @@
 # app.py (SQLite version)
-import os, sqlite3
-from flask import Flask, request, jsonify
+import os, sqlite3, threading
+import orjson
+from flask import Flask, Response, g, request
 from flask_cors import CORS
 from datetime import datetime
+from functools import lru_cache
 
 
 # Shared ORDER BY clause to ensure "Overall" comes first
@@ -19,27 +21,128 @@ ORDER BY CASE category
 END
 """
 
+# Accepted ?sign= / ?category= values (lowercased); anything else is a 400.
+# SIGNS maps each sign to its signs.id / sign_id in the DB (same order as the loader).
+SIGNS = {name: i for i, name in enumerate([
+    "aries", "taurus", "gemini", "cancer", "leo", "virgo",
+    "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces",
+])}
+CATEGORIES = frozenset({
+    "overall", "career & work", "finance & money", "health & wellness",
+    "love & relationships", "luck & opportunities", "travel & adventure",
+})
+
 app = Flask(__name__)
 CORS(app)
 
 DB_PATH = os.environ.get("DB_PATH", "data/horoscope.db")
+AVAILABILITY_PATH = os.environ.get("AVAILABILITY_PATH", os.path.join(os.path.dirname(DB_PATH), "availability.json"))
+
+# Reads are served from an in-memory copy of DB_PATH (the whole dataset is a few MB).
+# Each copy is a named shared-cache memory DB so every thread's connection sees it;
+# when the file's mtime changes a new copy is made and threads reconnect to it.
+_mirror = {"mtime": None, "uri": None, "keep": None}
+_mirror_lock = threading.Lock()
+_tls = threading.local()
+
+def _mirror_uri():
+    mtime = os.path.getmtime(DB_PATH)
+    if _mirror["mtime"] != mtime:
+        with _mirror_lock:
+            if _mirror["mtime"] != mtime:
+                uri = f"file:horoscope-{mtime}?mode=memory&cache=shared"
+                keep = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                src = sqlite3.connect(DB_PATH)
+                src.backup(keep)
+                src.close()
+                # the previous copy is freed once its last thread connection closes
+                _mirror.update(mtime=mtime, uri=uri, keep=keep)
+    return _mirror["uri"]
+
+def _conn():
+    # one read-only connection per thread, reused until the mirror is replaced
+    uri = _mirror_uri()
+    con = getattr(_tls, "con", None)
+    if con is None or _tls.uri != uri:
+        if con is not None:
+            con.close()
+        con = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+        con.execute("PRAGMA query_only=1")
+        _tls.con, _tls.uri = con, uri
+    return con
 
 def q(sql, params=()):
-    con = sqlite3.connect(DB_PATH)
-    con.row_factory = sqlite3.Row
-    rows = con.execute(sql, params).fetchall()
-    con.close()
-    return [dict(r) for r in rows]
+    # plain tuples zipped with the column names once, rather than a sqlite3.Row per row
+    cur = _conn().execute(sql, params)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
 
 def one(sql, params=()):
-    con = sqlite3.connect(DB_PATH)
-    con.row_factory = sqlite3.Row
-    row = con.execute(sql, params).fetchone()
-    con.close()
-    return dict(row) if row else None
+    cur = _conn().execute(sql, params)
+    row = cur.fetchone()
+    return dict(zip([d[0] for d in cur.description], row)) if row else None
+
+def _json(obj):
+    return Response(orjson.dumps(obj), mimetype="application/json")
+
+def _json_body(body):
+    return Response(body, mimetype="application/json")
+
+def _db_mtime():
+    # part of every response cache key: a reload of the DB invalidates cached bodies
+    return os.path.getmtime(DB_PATH)
 
 def norm(s): return (s or "").strip().lower()
 
+def response_key(period, sign, *keys):
+    # same layout as build_responses() in scripts/load_to_sqlite.py
+    return "|".join([period[0], sign, *keys])
+
+def stored_response(period, sign, *keys):
+    # pre-encoded body built by the loader, or None when the combination has no rows
+    row = one("SELECT body FROM responses WHERE key=?", (response_key(period, sign, *keys),))
+    return row["body"] if row else None
+
+@app.before_request
+def validate_args():
+    # normalize ?sign=/?category= once per forecast request; routes read g.sign/g.category
+    if request.endpoint not in ("daily", "weekly", "monthly"):
+        return None
+    g.sign = norm(request.args.get("sign", "aries"))
+    if g.sign not in SIGNS:
+        return _json({"error": f"unknown sign: {g.sign}"}), 400
+    g.category = norm(request.args.get("category"))
+    if g.category and g.category not in CATEGORIES:
+        return _json({"error": f"unknown category: {g.category}"}), 400
+    return None
+
+# Responses only change when the loader rewrites the DB, so they are tagged with its mtime
+CACHEABLE = ("daily", "weekly", "monthly", "availability")
+
+def _etag():
+    tag = format(int(_db_mtime() * 1000), "x")
+    if request.endpoint == "weekly" and not (request.args.get("week_start") and request.args.get("week_end")):
+        # the picked week also depends on today's date
+        tag += "-" + datetime.utcnow().strftime("%Y-%m-%d")
+    return tag
+
+@app.before_request
+def check_etag():
+    # answer If-None-Match with a 304 before any cache or DB work
+    if request.endpoint not in CACHEABLE:
+        return None
+    g.etag = _etag()
+    if request.if_none_match.contains(g.etag):
+        return Response(status=304)
+    return None
+
+@app.after_request
+def add_cache_headers(response):
+    if response.status_code in (200, 304) and "etag" in g:
+        response.set_etag(g.etag)
+        response.headers["Cache-Control"] = "public, max-age=60"
+    return response
+
 @app.route("/api/v1/forecast/daily")
 def daily():
     """
@@ -47,26 +150,35 @@ def daily():
     ?date=YYYY-MM-DD (optional; if omitted, uses latest available date for that sign)
     ?category=...
     """
-    sign = norm(request.args.get("sign", "aries"))
-    qdate = request.args.get("date", "")
+    return _json_body(_daily(
+        g.sign,
+        request.args.get("date", ""),
+        g.category,
+        _db_mtime()))
 
+@lru_cache(maxsize=2048)
+def _daily(sign, qdate, category, mtime):
+    sid = SIGNS[sign]
     if not qdate:
-        row = one("SELECT MAX(date) AS d FROM daily WHERE sign=?", (sign,))
+        row = one("SELECT daily_date AS d FROM latest WHERE sign_id=?", (sid,))
         qdate = (row["d"] if row and row["d"] else "")
 
-    category = request.args.get("category")
+    body = stored_response("daily", sign, qdate, category)
+    if body is not None:
+        return body
+
     if category:
         rows = q("""SELECT category, forecast, COALESCE(stars,3) AS stars
                     FROM daily
-                    WHERE sign=? AND date=? AND LOWER(category)=?""" + ORDER_BY_CATEGORY,
-                 (sign, qdate, norm(category)))
+                    WHERE sign_id=? AND date=? AND category_lc=?""" + ORDER_BY_CATEGORY,
+                 (sid, qdate, category))
     else:
         rows = q("""SELECT category, forecast, COALESCE(stars,3) AS stars
                     FROM daily
-                    WHERE sign=? AND date=?
-                    """ + ORDER_BY_CATEGORY, (sign, qdate))
+                    WHERE sign_id=? AND date=?
+                    """ + ORDER_BY_CATEGORY, (sid, qdate))
 
-    return jsonify({
+    return orjson.dumps({
         "period": "daily",
         "sign": sign,
         "date": qdate,
@@ -81,69 +193,83 @@ def weekly():
     ?month=YYYY-MM (optional; helps pick a week)
     ?category=...
     """
-    sign = norm(request.args.get("sign", "aries"))
-    ws   = request.args.get("week_start", "")
-    we   = request.args.get("week_end", "")
-    month = request.args.get("month", "")
+    ws = request.args.get("week_start", "")
+    we = request.args.get("week_end", "")
+    # "today" only matters when the week has to be picked for the caller
+    today = "" if (ws and we) else datetime.utcnow().strftime("%Y-%m-%d")
+    return _json_body(_weekly(
+        g.sign,
+        ws, we,
+        request.args.get("month", ""),
+        g.category,
+        today,
+        _db_mtime()))
 
+@lru_cache(maxsize=2048)
+def _weekly(sign, ws, we, month, category, today, mtime):
+    sid = SIGNS[sign]
     if not (ws and we):
-         # 1) Try the week that contains "today"
-        today = datetime.utcnow().strftime("%Y-%m-%d")
+        # 1) Try the week that contains "today"
         row = one("""
             SELECT week_start, week_end
             FROM weekly
-            WHERE sign=? AND week_start <= ? AND week_end >= ?
+            WHERE sign_id=? AND week_start <= ? AND week_end >= ?
             ORDER BY week_start DESC
             LIMIT 1
-        """, (sign, today, today))
+        """, (sid, today, today))
 
     # 2) If a month is provided and the "today" week wasn't found (or today not in that month),
-        #    pick the first week inside that month as a clear default.
+        #    pick the first week inside that month as a clear default
+        #    (one seek per ym_* index, merged in week_start order).
         if not row and month:
             row = one("""
-                SELECT week_start, week_end
-                FROM weekly
-                WHERE sign=? AND (substr(week_start,1,7)=? OR substr(week_end,1,7)=?)
+                SELECT week_start, week_end FROM (
+                    SELECT week_start, week_end FROM weekly WHERE sign_id=? AND ym_start=?
+                    UNION ALL
+                    SELECT week_start, week_end FROM weekly WHERE sign_id=? AND ym_end=?)
                 ORDER BY week_start ASC
                 LIMIT 1
-            """, (sign, month, month))
+            """, (sid, month, sid, month))
 
         # 3) If still nothing, pick the most recent week that started on/before today.
         if not row:
             row = one("""
                 SELECT week_start, week_end
                 FROM weekly
-                WHERE sign=? AND week_start <= ?
+                WHERE sign_id=? AND week_start <= ?
                 ORDER BY week_start DESC
                 LIMIT 1
-            """, (sign, today))
+            """, (sid, today))
 
         # 4) Final fallback: very first available week for that sign.
         if not row:
             row = one("""
                 SELECT week_start, week_end
                 FROM weekly
-                WHERE sign=?
+                WHERE sign_id=?
                 ORDER BY week_start ASC
                 LIMIT 1
-            """, (sign,))
+            """, (sid,))
 
         if row:
             ws, we = row["week_start"], row["week_end"]
 
-    category = request.args.get("category")
+    body = stored_response("weekly", sign, ws, we, category)
+    if body is not None:
+        return body
+
     if category:
         rows = q("""SELECT category, forecast, COALESCE(stars,3) AS stars
                     FROM weekly
-                    WHERE sign=? AND week_start=? AND week_end=? AND LOWER(category)=?""" + ORDER_BY_CATEGORY,
-                 (sign, ws, we, norm(category)))
+                    WHERE sign_id=? AND week_start=? AND week_end=? AND category_lc=?""" + ORDER_BY_CATEGORY,
+                 (sid, ws, we, category))
     else:
         rows = q("""SELECT category, forecast, COALESCE(stars,3) AS stars
                     FROM weekly
-                    WHERE sign=? AND week_start=? AND week_end=?
-                    """ + ORDER_BY_CATEGORY, (sign, ws, we))
+                    WHERE sign_id=? AND week_start=? AND week_end=?
+                    """ + ORDER_BY_CATEGORY, (sid, ws, we))
 
-    return jsonify({
+    return orjson.dumps({
         "period": "weekly",
         "sign": sign,
         "week_start": ws,
@@ -158,65 +284,54 @@ def monthly():
     ?month=YYYY-MM (optional; if omitted, picks latest available month for that sign)
     ?category=...
     """
-    sign = norm(request.args.get("sign", "aries"))
-    month = request.args.get("month", "")
+    return _json_body(_monthly(
+        g.sign,
+        request.args.get("month", ""),
+        g.category,
+        _db_mtime()))
 
+@lru_cache(maxsize=2048)
+def _monthly(sign, month, category, mtime):
+    sid = SIGNS[sign]
     if not month:
-        row = one("SELECT MAX(month) AS m FROM monthly WHERE sign=?", (sign,))
+        row = one("SELECT monthly_month AS m FROM latest WHERE sign_id=?", (sid,))
         month = (row["m"] if row and row["m"] else "")
 
-    category = request.args.get("category")
+    body = stored_response("monthly", sign, month, category)
+    if body is not None:
+        return body
+
     if category:
         rows = q("""SELECT category, forecast, COALESCE(stars,3) AS stars
                     FROM monthly
-                    WHERE sign=? AND month=? AND LOWER(category)=?""" + ORDER_BY_CATEGORY,
-                    (sign, month, norm(category)))
+                    WHERE sign_id=? AND month=? AND category_lc=?""" + ORDER_BY_CATEGORY,
+                    (sid, month, category))
     else:
         rows = q("""SELECT category, forecast, COALESCE(stars,3) AS stars
                     FROM monthly
-                    WHERE sign=? AND month=?
-                    """ + ORDER_BY_CATEGORY, (sign, month))
+                    WHERE sign_id=? AND month=?
+                    """ + ORDER_BY_CATEGORY, (sid, month))
 
-    return jsonify({
+    return orjson.dumps({
         "period": "monthly",
         "sign": sign,
         "month": month,
         "items": rows
     })
 
+_availability = (None, b"")
+
 @app.route("/api/v1/availability")
 def availability():
-    # minimal: months per sign/period from DB
-    out = {}
-    # daily months
-    rows = q("SELECT sign, substr(date,1,7) AS ym FROM daily GROUP BY sign, ym ORDER BY sign, ym")
-    for r in rows:
-        out.setdefault(r["sign"], {"daily": [], "weekly": [], "monthly": []})
-        out[r["sign"]]["daily"].append(r["ym"])
-    # weekly months (from either week_start or week_end)
-    rows = q("SELECT sign, substr(week_start,1,7) AS ym FROM weekly GROUP BY sign, ym ORDER BY sign, ym")
-    for r in rows:
-        out.setdefault(r["sign"], {"daily": [], "weekly": [], "monthly": []})
-        if r["ym"] not in out[r["sign"]]["weekly"]:
-            out[r["sign"]]["weekly"].append(r["ym"])
-    rows = q("SELECT sign, substr(week_end,1,7) AS ym FROM weekly GROUP BY sign, ym ORDER BY sign, ym")
-    for r in rows:
-        out.setdefault(r["sign"], {"daily": [], "weekly": [], "monthly": []})
-        if r["ym"] not in out[r["sign"]]["weekly"]:
-            out[r["sign"]]["weekly"].append(r["ym"])
-    # monthly months
-    rows = q("SELECT sign, month FROM monthly GROUP BY sign, month ORDER BY sign, month")
-    for r in rows:
-        out.setdefault(r["sign"], {"daily": [], "weekly": [], "monthly": []})
-        out[r["sign"]]["monthly"].append(r["month"])
-    # sort arrays
-    for sign in out:
-        out[sign]["daily"].sort()
-        out[sign]["weekly"].sort()
-        out[sign]["monthly"].sort()
-    return jsonify(out)
+    # months per sign/period, precomputed by the loader; re-read only when the file changes
+    global _availability
+    mtime = os.path.getmtime(AVAILABILITY_PATH)
+    if _availability[0] != mtime:
+        with open(AVAILABILITY_PATH, "rb") as f:
+            _availability = (mtime, f.read())
+    return _json_body(_availability[1])
 
 @app.route("/health")
 def health():
     d_count = one("SELECT COUNT(*) AS c FROM daily") or {"c": 0}
-    return jsonify({"ok": True, "db": DB_PATH, "daily_rows": d_count["c"]})
+    return _json({"ok": True, "db": DB_PATH, "daily_rows": d_count["c"]})
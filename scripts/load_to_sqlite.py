@@ -1,23 +1,42 @@
 # scripts/load_to_sqlite.py
-import os, glob, csv, sqlite3
+import os, csv, json, sqlite3
+from datetime import date, datetime
 
 DATA_DIR = "data"
 DB_PATH = os.path.join(DATA_DIR, "horoscope.db")
+AVAILABILITY_PATH = os.path.join(DATA_DIR, "availability.json")
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# signs.id values; forecast tables store sign_id. app.py's SIGNS uses the same order.
+SIGNS = ["aries", "taurus", "gemini", "cancer", "leo", "virgo",
+         "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces"]
+SIGN_IDS = {name: i for i, name in enumerate(SIGNS)}
+
 con = sqlite3.connect(DB_PATH)
 cur = con.cursor()
 
+# Bulk-load settings: the DB is rebuilt from scratch, so a crash mid-load just means re-running.
+# WAL is restored at the end for the app's readers.
 cur.executescript("""
-PRAGMA journal_mode=WAL;
+PRAGMA journal_mode=MEMORY;
+PRAGMA synchronous=OFF;
 DROP TABLE IF EXISTS daily;
 DROP TABLE IF EXISTS weekly;
 DROP TABLE IF EXISTS monthly;
+DROP TABLE IF EXISTS latest;
+DROP TABLE IF EXISTS responses;
+DROP TABLE IF EXISTS signs;
+
+CREATE TABLE signs(
+  id INTEGER PRIMARY KEY,
+  name TEXT UNIQUE      -- aries..pisces (lowercase)
+);
 
 CREATE TABLE daily(
   date TEXT,            -- YYYY-MM-DD
-  sign TEXT,            -- aries..pisces (lowercase)
+  sign_id INTEGER,      -- signs.id
   category TEXT,
+  category_lc TEXT,     -- lowercased category, matched against ?category=
   forecast TEXT,
   stars INTEGER
 );
@@ -25,50 +44,184 @@ CREATE TABLE daily(
 CREATE TABLE weekly(
   week_start TEXT,      -- YYYY-MM-DD (Mon)
   week_end   TEXT,      -- YYYY-MM-DD (Sun)
-  sign TEXT,
+  ym_start   TEXT,      -- YYYY-MM of week_start
+  ym_end     TEXT,      -- YYYY-MM of week_end
+  sign_id INTEGER,
   category TEXT,
+  category_lc TEXT,
   forecast TEXT,
   stars INTEGER
 );
 
 CREATE TABLE monthly(
   month TEXT,           -- YYYY-MM
-  sign TEXT,
+  sign_id INTEGER,
   category TEXT,
+  category_lc TEXT,
   forecast TEXT,
   stars INTEGER
 );
-
-CREATE INDEX idx_daily   ON daily(sign, date);
-CREATE INDEX idx_weekly  ON weekly(sign, week_start, week_end);
-CREATE INDEX idx_monthly ON monthly(sign, month);
 """)
 
-def load_csvs(pattern, table, cols):
-  for path in sorted(glob.glob(os.path.join(DATA_DIR, pattern))):
+PERIODS = ("daily", "weekly", "monthly")
+
+def parse_csv_name(name):
+  # "<sign>_<yyyy-mm>_<period>[_with_stars].csv" or "<yyyy-mm>_<period>.csv"
+  parts = name[:-len(".csv")].split("_", 3)
+  if parts[0][:1].isdigit():
+    parts.insert(0, "")          # all-signs file
+  if len(parts) < 3 or parts[2] not in PERIODS:
+    return None
+  return parts[0].lower(), parts[1], parts[2]
+
+def index_csvs():
+  # one scandir pass over DATA_DIR; keep the newest file per (sign, yyyy-mm, period)
+  newest = {}
+  with os.scandir(DATA_DIR) as it:
+    for entry in it:
+      if not (entry.is_file() and entry.name.endswith(".csv")):
+        continue
+      key = parse_csv_name(entry.name)
+      if key is None:
+        continue
+      mtime = entry.stat().st_mtime
+      if key not in newest or mtime > newest[key][0]:
+        newest[key] = (mtime, entry.path)
+  idx = {p: [] for p in PERIODS}
+  for (_, _, period), (_, path) in newest.items():
+    idx[period].append(path)
+  for paths in idx.values():
+    paths.sort()
+  return idx
+
+# Dates are stored as canonical ISO text so that TEXT comparison, MAX() and the
+# (sign, date) indexes order them chronologically; the app never parses dates.
+DATE_COLS = {
+  "date":       lambda v: date.fromisoformat(v).isoformat(),
+  "week_start": lambda v: date.fromisoformat(v).isoformat(),
+  "week_end":   lambda v: date.fromisoformat(v).isoformat(),
+  "month":      lambda v: datetime.strptime(v, "%Y-%m").strftime("%Y-%m"),
+}
+
+def read_rows(f, cols):
+  # yields one row at a time so executemany streams the file instead of buffering it
+  for row in csv.DictReader(f):
+    # normalize
+    row["sign_id"] = SIGN_IDS[row["sign"].strip().lower()]
+    row["category_lc"] = (row.get("category") or "").strip().lower()
+    for c in cols:
+      if c in DATE_COLS:
+        row[c] = DATE_COLS[c](row[c].strip())
+    if "stars" in row and row["stars"]:
+      try:
+        row["stars"] = int(row["stars"])
+      except:
+        row["stars"] = 3
+    yield [row.get(c, "") for c in cols]
+
+def load_csvs(paths, table, cols):
+  q = f"INSERT INTO {table}({','.join(cols)}) VALUES ({','.join(['?']*len(cols))})"
+  for path in paths:
     with open(path, encoding="utf-8-sig", newline="") as f:
-      r = csv.DictReader(f)
-      rows = []
-      for row in r:
-        # normalize
-        if "sign" in row and row["sign"]:
-          row["sign"] = row["sign"].strip().lower()
-        if "stars" in row and row["stars"]:
-          try:
-            row["stars"] = int(row["stars"])
-          except:
-            row["stars"] = 3
-        rows.append([row.get(c, "") for c in cols])
-      if rows:
-        q = f"INSERT INTO {table}({','.join(cols)}) VALUES ({','.join(['?']*len(cols))})"
-        cur.executemany(q, rows)
-        print(f"Loaded {len(rows):4d} rows from {os.path.basename(path)} into {table}")
-
-# Load your existing files in data/
-load_csvs("*daily*.csv",   "daily",   ["date","sign","category","forecast","stars"])
-load_csvs("*weekly*.csv",  "weekly",  ["week_start","week_end","sign","category","forecast","stars"])
-load_csvs("*monthly*.csv", "monthly", ["month","sign","category","forecast","stars"])
+      cur.executemany(q, read_rows(f, cols))
+    if cur.rowcount > 0:
+      print(f"Loaded {cur.rowcount:4d} rows from {os.path.basename(path)} into {table}")
+
+# Load your existing files in data/, all in one transaction
+csvs = index_csvs()
+cur.execute("BEGIN")
+cur.executemany("INSERT INTO signs(id, name) VALUES (?, ?)", enumerate(SIGNS))
+load_csvs(csvs["daily"],   "daily",   ["date","sign_id","category","category_lc","forecast","stars"])
+load_csvs(csvs["weekly"],  "weekly",  ["week_start","week_end","sign_id","category","category_lc","forecast","stars"])
+load_csvs(csvs["monthly"], "monthly", ["month","sign_id","category","category_lc","forecast","stars"])
+cur.execute("UPDATE weekly SET ym_start=substr(week_start,1,7), ym_end=substr(week_end,1,7)")
 
 con.commit()
+
+# Indexes are built once over the loaded rows rather than maintained per insert.
+# They carry category/forecast/stars too, so the forecast queries in app.py are
+# answered from the index alone (the tables are read-only between loads).
+cur.executescript("""
+CREATE INDEX idx_daily   ON daily(sign_id, date, category_lc, category, forecast, stars);
+CREATE INDEX idx_weekly  ON weekly(sign_id, week_start, week_end, category_lc, category, forecast, stars);
+CREATE INDEX idx_weekly_ym_start ON weekly(sign_id, ym_start, week_start, week_end);
+CREATE INDEX idx_weekly_ym_end   ON weekly(sign_id, ym_end, week_start, week_end);
+CREATE INDEX idx_monthly ON monthly(sign_id, month, category_lc, category, forecast, stars);
+ANALYZE;
+""")
+
+# Latest date/month per sign, so routes without ?date=/?month= skip the MAX() lookup.
+# Rebuilt on every load, which is the only time the forecast tables change.
+cur.executescript("""
+CREATE TABLE latest(
+  sign_id INTEGER PRIMARY KEY,
+  daily_date TEXT,      -- MAX(daily.date)
+  monthly_month TEXT    -- MAX(monthly.month)
+);
+INSERT INTO latest(sign_id, daily_date, monthly_month)
+SELECT s.sign_id,
+       (SELECT MAX(date)  FROM daily   WHERE sign_id=s.sign_id),
+       (SELECT MAX(month) FROM monthly WHERE sign_id=s.sign_id)
+FROM (SELECT sign_id FROM daily UNION SELECT sign_id FROM monthly) AS s;
+""")
+
+# Pre-encoded forecast response bodies for every (sign, date/week/month, category),
+# keyed the same way as response_key() in app.py. Must match the routes' output:
+# same fields, same order, "Overall" first.
+CATEGORY_RANK = {c: i for i, c in enumerate([
+  "Overall", "Career & Work", "Finance & Money", "Health & Wellness",
+  "Love & Relationships", "Luck & Opportunities", "Travel & Adventure",
+])}
+
+def build_responses(period, table, key_cols):
+  groups = {}
+  sql = (f"SELECT s.name, {','.join(key_cols)}, category_lc, category, forecast, COALESCE(stars,3) "
+         f"FROM {table} JOIN signs AS s ON s.id={table}.sign_id")
+  for row in cur.execute(sql):
+    cat_lc, category, forecast, stars = row[-4:]
+    item = {"category": category, "forecast": forecast, "stars": stars}
+    groups.setdefault(row[:-4], []).append((cat_lc, item))
+  out = []
+  for (sign, *keys), items in groups.items():
+    items.sort(key=lambda it: CATEGORY_RANK.get(it[1]["category"], 99))
+    head = {"period": period, "sign": sign, **dict(zip(key_cols, keys))}
+    for cat in [""] + sorted({c for c, _ in items}):
+      body = {**head, "items": [it for c, it in items if not cat or c == cat]}
+      key = "|".join([period[0], sign, *keys, cat])
+      out.append((key, json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")))
+  return out
+
+cur.execute("CREATE TABLE responses(key TEXT PRIMARY KEY, body BLOB) WITHOUT ROWID")
+for args in (("daily", "daily", ["date"]),
+             ("weekly", "weekly", ["week_start", "week_end"]),
+             ("monthly", "monthly", ["month"])):
+  cur.executemany("INSERT INTO responses(key, body) VALUES (?, ?)", build_responses(*args))
+
+con.commit()
+
+# /api/v1/availability payload: months per sign/period, served as-is by app.py
+def build_availability():
+  # one pass: UNION already dedups (sign, period, month), ORDER BY sorts them
+  out = {}
+  rows = cur.execute("""
+    SELECT s.name, p, ym FROM (
+      SELECT sign_id, 'daily' AS p, substr(date,1,7) AS ym FROM daily
+      UNION SELECT sign_id, 'weekly',  ym_start FROM weekly
+      UNION SELECT sign_id, 'weekly',  ym_end   FROM weekly
+      UNION SELECT sign_id, 'monthly', month    FROM monthly
+    ) JOIN signs AS s ON s.id=sign_id
+    ORDER BY s.name, p, ym
+  """)
+  for sign, period, ym in rows:
+    out.setdefault(sign, {"daily": [], "weekly": [], "monthly": []})[period].append(ym)
+  return out
+
+with open(AVAILABILITY_PATH, "w", encoding="utf-8") as f:
+  json.dump(build_availability(), f, sort_keys=True, separators=(",", ":"))
+
+cur.executescript("""
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+""")
 con.close()
-print(f"✅ SQLite ready at {DB_PATH}")
+print(f"✅ SQLite ready at {DB_PATH}, availability at {AVAILABILITY_PATH}")